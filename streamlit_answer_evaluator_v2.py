@@ -10,19 +10,41 @@ Features:
 """
 
 import streamlit as st
-import anthropic
 import base64
 import hashlib
 import json
 import re
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from io import BytesIO
-from pypdf import PdfReader, PdfWriter
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from xml.sax.saxutils import escape
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None  # stdlib hashing is used when the wheel isn't available
+try:
+    import pikepdf
+except ImportError:
+    pikepdf = None  # pypdf handles merge/write when the wheel isn't available
+try:
+    import pybase64
+except ImportError:
+    pybase64 = None  # stdlib base64 is used when the wheel isn't available
+try:
+    import fitz  # pymupdf
+except ImportError:
+    fitz = None  # uploads go to the API unchanged when it isn't available
+try:
+    import orjson
+except ImportError:
+    orjson = None  # stdlib json is used when the wheel isn't available
+# anthropic, pypdf and reportlab are imported lazily inside the
+# functions that use them: reportlab alone pulls in 30+ submodules and
+# font tables, so keeping them off the module top level cuts cold-start
+# time and memory for paths that never render a PDF.
 
 # Page configuration
 st.set_page_config(
@@ -31,14 +53,42 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize cache for consistent evaluations
-if 'evaluation_cache' not in st.session_state:
-    st.session_state['evaluation_cache'] = {}
+# Bytes of the file head/tail fed into the cache-key hash; uploads with
+# identical length and identical 128 KB head+tail are practically the
+# same file, so hashing stays O(1) instead of O(N) per rerun.
+_FINGERPRINT_BYTES = 65536
 
 def get_file_hash(file_data: bytes, evaluation_mode: str, custom_criteria: str) -> str:
-    """Generate a unique hash for the file + settings combination."""
-    content = file_data + evaluation_mode.encode() + custom_criteria.encode()
-    return hashlib.sha256(content).hexdigest()
+    """Generate a unique hash for the file + settings combination.
+
+    Streamlit reruns the script on every widget interaction, so this
+    hashes only a fingerprint (length + first/last 64 KB) rather than the
+    whole multi-MB PDF, with BLAKE3 (SIMD) when available.
+    """
+    if blake3 is not None:
+        h = blake3.blake3()
+    else:
+        h = hashlib.blake2b(digest_size=16)
+    h.update(len(file_data).to_bytes(8, 'little'))
+    h.update(file_data[:_FINGERPRINT_BYTES])
+    h.update(file_data[-_FINGERPRINT_BYTES:])
+    h.update(evaluation_mode.encode())
+    h.update(custom_criteria.encode())
+    return h.hexdigest()
+
+def _json_loads(s):
+    """json.loads, through orjson's Rust parser when available."""
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+
+def _json_dumps_sorted(obj) -> str:
+    """Deterministic sorted-key JSON, used as a cache key."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode()
+    return json.dumps(obj, sort_keys=True)
+
 
 def get_evaluation_prompt(mode: str) -> str:
     """Get the evaluation prompt based on the selected mode."""
@@ -87,61 +137,125 @@ Rules:
     return prompt
 
 
-def create_marks_overlay(evaluation_data: dict, page_width: float, page_height: float, page_num: int) -> BytesIO:
-    """Create a transparent overlay PDF with marks for a specific page."""
+@st.cache_resource
+def _draw_styles() -> dict:
+    """Shared reportlab color/style objects, built on first render.
+
+    Cached per process so the lazy reportlab import doesn't reintroduce
+    a fresh Color construction per page (or per question, in the
+    overlay).
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+
+    return {
+        'box_bg': colors.Color(1, 0.9, 0.9, alpha=0.9),
+        'header': colors.Color(0.2, 0.3, 0.5),
+        'accent': colors.Color(0.8, 0.2, 0.2),
+        'score_box_bg': colors.Color(0.95, 0.95, 1),
+        'suggestion': colors.Color(0.1, 0.5, 0.1),
+        # Style for the wrapped overall-feedback paragraph
+        'feedback': ParagraphStyle(
+            'feedback',
+            fontName='Helvetica-Oblique',
+            fontSize=10,
+            leading=14
+        ),
+    }
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _all_overlay_bytes(eval_json: str, page_dims: tuple) -> tuple:
+    """Render the marks overlays into one multi-page PDF.
+
+    Takes the evaluation as canonical JSON so st.cache_data can key on it.
+    Building a single document (c.setPageSize + c.showPage per page) means
+    create_marked_pdf parses the overlays with pypdf once, instead of one
+    reportlab+pypdf round-trip per page.
+
+    Pages with no questions (blank backs, instruction pages) get no
+    overlay page at all; returns (pdf_bytes, drawn_page_nums) so the
+    caller knows which original page each overlay page belongs to.
+    """
+    from reportlab.pdfgen import canvas
+    from reportlab.lib import colors
+
+    styles = _draw_styles()
+    evaluation_data = _json_loads(eval_json)
+
+    # Group questions by page once, instead of rescanning the whole
+    # question list for every page
+    pages_by_num = defaultdict(list)
+    for q in evaluation_data.get('questions', []):
+        pages_by_num[q.get('page_number', 1)].append(q)
+
     packet = BytesIO()
-    c = canvas.Canvas(packet, pagesize=(page_width, page_height))
-    
-    # Get questions for this page
-    questions_on_page = [q for q in evaluation_data.get('questions', []) 
-                        if q.get('page_number', 1) == page_num]
-    
-    if questions_on_page:
-        # Position marks in the right margin
+    c = canvas.Canvas(packet, pagesize=page_dims[0])
+    drawn_pages = []
+
+    for page_num, (page_width, page_height) in enumerate(page_dims, 1):
+        questions_on_page = pages_by_num.get(page_num)
+        if not questions_on_page:
+            continue
+
+        c.setPageSize((page_width, page_height))
+
+        # Lay out each question's slot in the right margin first so
+        # the draw calls below can be grouped by canvas state
         margin_x = page_width - 80
         y_position = page_height - 60
-        
+        slots = []
+
         for q in questions_on_page:
-            # Draw a box for marks
-            box_width = 70
-            box_height = 40
-            
-            # Red box background
-            c.setFillColor(colors.Color(1, 0.9, 0.9, alpha=0.9))
-            c.setStrokeColor(colors.red)
-            c.setLineWidth(2)
-            c.roundRect(margin_x - 5, y_position - 30, box_width, box_height, 5, fill=1, stroke=1)
-            
-            # Question number
-            c.setFillColor(colors.red)
-            c.setFont("Helvetica-Bold", 10)
-            c.drawString(margin_x, y_position, f"Q{q.get('question_number', '?')}")
-            
-            # Marks
-            c.setFont("Helvetica-Bold", 14)
-            marks_text = f"{q.get('marks_awarded', '?')}/{q.get('max_marks', '?')}"
-            c.drawString(margin_x, y_position - 20, marks_text)
-            
+            slots.append((q, margin_x, y_position))
             y_position -= 70  # Space between questions
-            
+
             if y_position < 100:  # Reset if we're near bottom
                 y_position = page_height - 60
                 margin_x -= 90  # Move to next column
-    
+
+        # All mark boxes: one fill/stroke/width setup for the page
+        c.setFillColor(styles['box_bg'])
+        c.setStrokeColor(colors.red)
+        c.setLineWidth(2)
+        for q, x, y in slots:
+            c.roundRect(x - 5, y - 30, 70, 40, 5, fill=1, stroke=1)
+
+        # All question numbers: one font/color setup
+        c.setFillColor(colors.red)
+        c.setFont("Helvetica-Bold", 10)
+        for q, x, y in slots:
+            c.drawString(x, y, f"Q{q.get('question_number', '?')}")
+
+        # All marks
+        c.setFont("Helvetica-Bold", 14)
+        for q, x, y in slots:
+            c.drawString(x, y - 20, f"{q.get('marks_awarded', '?')}/{q.get('max_marks', '?')}")
+
+        c.showPage()
+        drawn_pages.append(page_num)
+
     c.save()
-    packet.seek(0)
-    return packet
+    return packet.getvalue(), tuple(drawn_pages)
 
 
-def create_summary_page(evaluation_data: dict, mode: str) -> BytesIO:
-    """Create a summary page PDF with all marks and suggestions."""
+@st.cache_data(max_entries=32, show_spinner=False)
+def _summary_bytes(eval_json: str, mode: str) -> bytes:
+    """Render the summary page PDF; cached on the evaluation JSON + mode."""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import Paragraph
+
+    styles = _draw_styles()
+    evaluation_data = _json_loads(eval_json)
     packet = BytesIO()
     c = canvas.Canvas(packet, pagesize=A4)
     width, height = A4
-    
+
     # Colors
-    header_color = colors.Color(0.2, 0.3, 0.5)
-    accent_color = colors.Color(0.8, 0.2, 0.2)
+    header_color = styles['header']
+    accent_color = styles['accent']
     
     y = height - 50
     
@@ -165,7 +279,7 @@ def create_summary_page(evaluation_data: dict, mode: str) -> BytesIO:
     y -= 30
     
     # Total Score Box
-    c.setFillColor(colors.Color(0.95, 0.95, 1))
+    c.setFillColor(styles['score_box_bg'])
     c.setStrokeColor(header_color)
     c.setLineWidth(2)
     c.roundRect(50, y - 60, width - 100, 70, 10, fill=1, stroke=1)
@@ -242,11 +356,11 @@ def create_summary_page(evaluation_data: dict, mode: str) -> BytesIO:
     y -= 15
     
     # Improvement Suggestions
-    c.setFillColor(colors.Color(0.1, 0.5, 0.1))
+    c.setFillColor(styles['suggestion'])
     c.setFont("Helvetica-Bold", 14)
     c.drawString(50, y, "SUGGESTIONS FOR IMPROVEMENT")
     y -= 5
-    c.setStrokeColor(colors.Color(0.1, 0.5, 0.1))
+    c.setStrokeColor(styles['suggestion'])
     c.line(50, y, 300, y)
     y -= 18
     
@@ -268,104 +382,353 @@ def create_summary_page(evaluation_data: dict, mode: str) -> BytesIO:
         c.drawString(50, y, "Overall Assessment:")
         y -= 15
         
-        c.setFillColor(colors.black)
-        c.setFont("Helvetica-Oblique", 10)
+        # Paragraph wraps on measured glyph widths in linear time,
+        # unlike the old character-count loop that rebuilt the line
+        # string per word. Its text is parsed as intra-paragraph XML,
+        # so the raw LLM output must be escaped: tag-like content would
+        # otherwise raise a parse error or be rendered as styling
         feedback = evaluation_data.get('overall_feedback', '')
-        
-        # Word wrap the feedback
-        words = feedback.split()
-        line = ""
-        for word in words:
-            if len(line + word) < 80:
-                line += word + " "
-            else:
-                c.drawString(60, y, line.strip())
-                y -= 14
-                line = word + " "
-        if line:
-            c.drawString(60, y, line.strip())
+        if feedback:
+            p = Paragraph(escape(feedback), styles['feedback'])
+            w, h = p.wrap(width - 120, y - 40)
+            p.drawOn(c, 60, y - h)
     
     # Footer
     c.setFillColor(colors.gray)
     c.setFont("Helvetica", 8)
     c.drawCentredString(width/2, 30, "Generated by Answer Sheet Evaluator | Powered by Claude AI")
-    
+
     c.save()
-    packet.seek(0)
-    return packet
+    return packet.getvalue()
 
 
-def create_marked_pdf(original_pdf_bytes: bytes, evaluation_data: dict, mode: str) -> bytes:
-    """Create the final PDF with marks overlay and summary page."""
-    
-    # Read original PDF
+def get_page_dims(file_data: bytes) -> tuple:
+    """Extract (width, height) for every page of the upload.
+
+    Makes no Streamlit calls, so it is safe to run in a worker thread;
+    the single-file flow computes it during the Claude wait.
+    """
+    if pikepdf is not None:
+        with pikepdf.Pdf.open(BytesIO(file_data)) as pdf:
+            return tuple(
+                (float(page.mediabox[2]) - float(page.mediabox[0]),
+                 float(page.mediabox[3]) - float(page.mediabox[1]))
+                for page in pdf.pages
+            )
+
+    from pypdf import PdfReader
+
+    reader = PdfReader(BytesIO(file_data))
+    return tuple(
+        (float(page.mediabox.width), float(page.mediabox.height))
+        for page in reader.pages
+    )
+
+
+def create_marked_pdf(original_pdf_bytes: bytes, evaluation_data: dict, mode: str,
+                      page_dims: tuple = None) -> bytes:
+    """Create the final PDF with marks overlay and summary page.
+
+    page_dims, when precomputed (see get_page_dims), skips re-deriving
+    the page geometry here.
+    """
+
+    # Canonical JSON form of the evaluation, the cache key for the
+    # rendered overlay/summary bytes
+    eval_json = _json_dumps_sorted(evaluation_data)
+
+    if pikepdf is not None:
+        # qpdf (C++) does the parse/merge/write work instead of pure-Python
+        # pypdf; reportlab still authors the overlay and summary pages
+        output_buffer = BytesIO()
+        with ExitStack() as stack:
+            pdf = stack.enter_context(pikepdf.Pdf.open(BytesIO(original_pdf_bytes)))
+            if page_dims is None:
+                page_dims = tuple(
+                    (float(page.mediabox[2]) - float(page.mediabox[0]),
+                     float(page.mediabox[3]) - float(page.mediabox[1]))
+                    for page in pdf.pages
+                )
+
+            overlay_pdf, drawn_pages = _all_overlay_bytes(eval_json, page_dims)
+            if drawn_pages:
+                overlays = stack.enter_context(pikepdf.Pdf.open(BytesIO(overlay_pdf)))
+                for idx, page_num in enumerate(drawn_pages):
+                    pdf.pages[page_num - 1].add_overlay(overlays.pages[idx])
+
+            summary = stack.enter_context(pikepdf.Pdf.open(BytesIO(_summary_bytes(eval_json, mode))))
+            pdf.pages.extend(summary.pages)
+            # Pass original streams through untouched (no decode/
+            # re-encode of content we never modified) and pack objects
+            # into compressed object streams for a smaller file
+            pdf.save(
+                output_buffer,
+                linearize=False,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                stream_decode_level=pikepdf.StreamDecodeLevel.none
+            )
+        return output_buffer.getvalue()
+
+    # Pure-Python fallback: read original PDF with pypdf
+    from pypdf import PdfReader, PdfWriter
+
     original_reader = PdfReader(BytesIO(original_pdf_bytes))
     writer = PdfWriter()
-    
-    # Process each page
-    for page_num, page in enumerate(original_reader.pages, 1):
-        page_width = float(page.mediabox.width)
-        page_height = float(page.mediabox.height)
-        
-        # Create overlay for this page
-        overlay_packet = create_marks_overlay(evaluation_data, page_width, page_height, page_num)
-        overlay_reader = PdfReader(overlay_packet)
-        
-        if len(overlay_reader.pages) > 0:
-            overlay_page = overlay_reader.pages[0]
-            page.merge_page(overlay_page)
-        
+
+    # Render all overlays as one multi-page document and parse it once
+    if page_dims is None:
+        page_dims = tuple(
+            (float(page.mediabox.width), float(page.mediabox.height))
+            for page in original_reader.pages
+        )
+    overlay_pdf, drawn_pages = _all_overlay_bytes(eval_json, page_dims)
+
+    # page number -> overlay page, only for pages that have questions
+    overlay_pages = {}
+    if drawn_pages:
+        overlay_reader = PdfReader(BytesIO(overlay_pdf))
+        overlay_pages = {
+            page_num: overlay_reader.pages[idx]
+            for idx, page_num in enumerate(drawn_pages)
+        }
+
+    # Merge overlays onto their originals; blank pages pass through
+    for i, page in enumerate(original_reader.pages, 1):
+        if i in overlay_pages:
+            page.merge_page(overlay_pages[i])
         writer.add_page(page)
-    
+
     # Add summary page at the end
-    summary_packet = create_summary_page(evaluation_data, mode)
+    summary_packet = BytesIO(_summary_bytes(eval_json, mode))
     summary_reader = PdfReader(summary_packet)
     for summary_page in summary_reader.pages:
         writer.add_page(summary_page)
-    
+
     # Write final PDF
     output_buffer = BytesIO()
     writer.write(output_buffer)
     output_buffer.seek(0)
-    
+
     return output_buffer.getvalue()
 
 
+# Every question object in the response schema ends with this field, so
+# counting it in the streamed text tracks completed questions without
+# reparsing the partial JSON on each chunk.
+_QUESTION_DONE_MARKER = '"brief_feedback"'
+
+
+# Compiled once: a fenced ```json block, or the outermost braces as the
+# fallback. One regex pass replaces the old chain of startswith/strip/
+# find scans over the full response.
+_FENCE_RE = re.compile(r'```(?:json)?\s*(\{.*\})\s*```', re.DOTALL)
+_BRACES_RE = re.compile(r'(\{.*\})', re.DOTALL)
+
+
 def parse_json_response(response_text: str) -> dict:
     """Parse JSON from Claude's response, handling potential issues."""
-    # Try to find JSON in the response
-    text = response_text.strip()
-    
-    # Remove markdown code blocks if present
-    if text.startswith("```json"):
-        text = text[7:]
-    if text.startswith("```"):
-        text = text[3:]
-    if text.endswith("```"):
-        text = text[:-3]
-    
-    text = text.strip()
-    
-    # Find JSON object
-    start = text.find('{')
-    end = text.rfind('}') + 1
-    
-    if start != -1 and end > start:
-        json_str = text[start:end]
+    m = _FENCE_RE.search(response_text) or _BRACES_RE.search(response_text)
+
+    if m:
+        json_str = m.group(1)
         try:
-            return json.loads(json_str)
+            return _json_loads(json_str)
         except json.JSONDecodeError as e:
             st.error(f"JSON parsing error: {e}")
             # Try to fix common issues
             json_str = json_str.replace("'", '"')
             try:
-                return json.loads(json_str)
+                return _json_loads(json_str)
             except:
                 pass
-    
+
     return None
 
 
+@st.cache_resource
+def get_client(api_key: str):
+    """One Anthropic client (and its httpx connection pool) per API key."""
+    import anthropic
+
+    return anthropic.Anthropic(api_key=api_key)
+
+
+# Seconds between processing_status checks while a batch runs
+_BATCH_POLL_INTERVAL = 5
+
+
+def encode_pdf_base64(file_data: bytes) -> str:
+    """Base64-encode a PDF for the API, with pybase64's SIMD encoder
+    when available."""
+    # b64encode_as_string is ~4-10x faster than the stdlib on the
+    # multi-MB PDFs this app handles and skips the separate decode copy
+    if pybase64 is not None:
+        return pybase64.b64encode_as_string(file_data)
+    return base64.b64encode(file_data).decode('ascii')
+
+
+# Only recompress uploads above this size; small PDFs aren't worth it
+_API_SIZE_THRESHOLD = 2_000_000
+# Handwriting stays legible at this density; phone scans are often 300+
+_API_IMAGE_DPI = 150
+_API_JPEG_QUALITY = 80
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def compress_pdf_for_api(file_data: bytes) -> bytes:
+    """Return a slimmed copy of the PDF for the API call.
+
+    Claude bills PDFs roughly by page-image tokens, so embedded scans are
+    downsampled to ~150 DPI grayscale JPEG and the file is rewritten with
+    metadata garbage-collected. The original bytes are untouched — the
+    marked-PDF overlay pipeline always works on the upload as-is.
+    """
+    if fitz is None or len(file_data) < _API_SIZE_THRESHOLD:
+        return file_data
+
+    try:
+        doc = fitz.open(stream=file_data, filetype='pdf')
+
+        for page in doc:
+            # Pixel budget for an image spanning the page width
+            max_width = page.rect.width / 72 * _API_IMAGE_DPI
+
+            for img in page.get_images(full=True):
+                xref = img[0]
+                pix = fitz.Pixmap(doc, xref)
+                changed = False
+
+                # Integer halving until within ~1.5x of the budget
+                while pix.width > max_width * 1.5:
+                    pix.shrink(1)
+                    changed = True
+
+                if pix.alpha:
+                    pix = fitz.Pixmap(pix, 0)
+                    changed = True
+                if pix.n >= 3:
+                    pix = fitz.Pixmap(fitz.csGRAY, pix)
+                    changed = True
+
+                if changed:
+                    page.replace_image(xref, stream=pix.tobytes("jpeg", jpg_quality=_API_JPEG_QUALITY))
+                pix = None
+
+        slim = doc.tobytes(deflate=True, garbage=4)
+        doc.close()
+
+        # Recompression can occasionally grow the file; keep the smaller
+        return slim if len(slim) < len(file_data) else file_data
+    except Exception:
+        # A malformed PDF shouldn't block evaluation; send it as-is
+        return file_data
+
+
+def build_system_blocks(mode: str) -> list:
+    """Static instructions as a cache_control system block.
+
+    The prompt is identical for every file in a session (a class set all
+    shares mode + criteria), so putting it in `system` means Anthropic
+    caches it once and every subsequent evaluation reads that prefix at
+    ~0.1x the input-token price.
+    """
+    return [
+        {
+            "type": "text",
+            "text": get_evaluation_prompt(mode),
+            "cache_control": {"type": "ephemeral"}
+        }
+    ]
+
+
+def build_message_content(pdf_data: str, custom_criteria: str) -> list:
+    """Build the user-message content blocks for one PDF evaluation.
+
+    The document carries cache_control so retries and criteria tweaks on
+    the same PDF re-read it at ~0.1x input-token price; the static
+    instructions live in the system blocks. Only the criteria tail stays
+    uncached.
+    """
+    return [
+        {
+            "type": "document",
+            "source": {
+                "type": "base64",
+                "media_type": "application/pdf",
+                "data": pdf_data
+            },
+            "cache_control": {"type": "ephemeral"}
+        },
+        {
+            "type": "text",
+            "text": (f"Additional Criteria:\n{custom_criteria}"
+                     if custom_criteria else "Evaluate the attached answer sheet.")
+        }
+    ]
+
+
+@st.cache_data(ttl=3600, max_entries=64, persist="disk", show_spinner=False)
+def evaluate(file_hash: str, mode: str, custom_criteria: str,
+             _api_key: str, _file_data: bytes) -> dict:
+    """Run the Claude evaluation and return the parsed JSON result.
+
+    Cached on the upload fingerprint + settings (the underscore args are
+    excluded from the key, so the multi-MB PDF is never rehashed) and
+    persisted to disk, so repeating an evaluation — even across app
+    restarts — is a lookup instead of an API call.
+    """
+    client = get_client(_api_key)
+
+    pdf_data = encode_pdf_base64(compress_pdf_for_api(_file_data))
+    content = build_message_content(pdf_data, custom_criteria)
+
+    # Stream the response so feedback starts as soon as Claude emits the
+    # first question instead of after the full 30-60s generation
+    progress_bar = st.progress(0.0, text="Waiting for Claude...")
+    response_chunks = []
+    questions_seen = 0
+    marker_tail = ""
+
+    with client.messages.stream(
+        model="claude-sonnet-4-20250514",
+        max_tokens=8000,
+        temperature=0,
+        system=build_system_blocks(mode),
+        extra_headers={"anthropic-beta": "prompt-caching-2024-07-31"},
+        messages=[
+            {
+                "role": "user",
+                "content": content
+            }
+        ]
+    ) as stream:
+        for text in stream.text_stream:
+            response_chunks.append(text)
+            # Scan only the new chunk (plus a small tail for markers
+            # split across chunks), not the whole buffer
+            window = marker_tail + text
+            found = window.count(_QUESTION_DONE_MARKER)
+            if found:
+                questions_seen += found
+                progress_bar.progress(
+                    min(0.1 + questions_seen * 0.08, 0.9),
+                    text=f"Evaluated {questions_seen} question(s)..."
+                )
+            marker_tail = window[-(len(_QUESTION_DONE_MARKER) - 1):]
+
+    response_text = "".join(response_chunks)
+    progress_bar.progress(1.0, text="Generating marked PDF...")
+
+    evaluation_data = parse_json_response(response_text)
+
+    if evaluation_data is None:
+        # Raising keeps the failure out of the cache so a retry re-calls
+        # the API
+        raise ValueError(f"Failed to parse evaluation. Raw response:\n{response_text[:500]}")
+
+    return evaluation_data
+
+
 # Title and description
 st.title("📝 Handwritten Answer Sheet Evaluator")
 st.markdown("##### Upload your answer sheet → Get marked PDF with summary")
@@ -405,7 +768,7 @@ with st.sidebar:
     
     # Clear cache button
     if st.button("🗑️ Clear Cache"):
-        st.session_state['evaluation_cache'] = {}
+        evaluate.clear()
         if 'marked_pdf' in st.session_state:
             del st.session_state['marked_pdf']
         st.success("Cache cleared!")
@@ -417,17 +780,19 @@ col1, col2 = st.columns([1, 1])
 with col1:
     st.header("📤 Upload Answer Sheet")
     
-    uploaded_file = st.file_uploader(
-        "Choose PDF file",
+    uploaded_files = st.file_uploader(
+        "Choose PDF file(s)",
         type=['pdf'],
-        help="Upload handwritten answer sheet"
+        accept_multiple_files=True,
+        help="Upload one answer sheet, or several to grade them as a batch (50% token discount)"
     )
-    
+
     custom_criteria = ""
-    
-    if uploaded_file:
-        st.success(f"✓ {uploaded_file.name}")
-        
+
+    if uploaded_files:
+        for f in uploaded_files:
+            st.success(f"✓ {f.name}")
+
         with st.expander("🎯 Custom Criteria (Optional)"):
             custom_criteria = st.text_area(
                 "Answer key or criteria:",
@@ -438,89 +803,123 @@ with col1:
 with col2:
     st.header("📥 Download Marked PDF")
     
-    if uploaded_file and api_key:
+    if uploaded_files and api_key and len(uploaded_files) == 1:
+        uploaded_file = uploaded_files[0]
         file_data = uploaded_file.getvalue()
         file_hash = get_file_hash(file_data, evaluation_mode, custom_criteria)
-        
-        is_cached = file_hash in st.session_state['evaluation_cache']
-        
-        if is_cached:
-            st.info("💾 Cached result available")
-        
-        button_text = "📋 Load Cached Result" if is_cached else "🚀 Evaluate & Generate PDF"
-        
-        if st.button(button_text, type="primary", use_container_width=True):
-            
-            if is_cached:
-                cached = st.session_state['evaluation_cache'][file_hash]
-                st.session_state['marked_pdf'] = cached['marked_pdf']
-                st.session_state['filename'] = cached['filename']
-                st.success("✓ Loaded from cache!")
-            else:
-                with st.spinner("Analyzing... This may take 30-60 seconds..."):
-                    try:
-                        client = anthropic.Anthropic(api_key=api_key)
-                        
-                        pdf_data = base64.standard_b64encode(file_data).decode('utf-8')
-                        
-                        prompt = get_evaluation_prompt(evaluation_mode)
-                        if custom_criteria:
-                            prompt += f"\n\nAdditional Criteria:\n{custom_criteria}"
-                        
-                        # Call Claude API
-                        message = client.messages.create(
-                            model="claude-sonnet-4-20250514",
-                            max_tokens=8000,
-                            temperature=0,
-                            messages=[
+
+        if st.button("🚀 Evaluate & Generate PDF", type="primary", use_container_width=True):
+            with st.spinner("Analyzing... This may take 30-60 seconds..."):
+                try:
+                    # Parse the original's page geometry in a worker
+                    # thread while the Claude call runs, so the overlay
+                    # render starts the moment the evaluation lands
+                    with ThreadPoolExecutor(max_workers=1) as pool:
+                        dims_future = pool.submit(get_page_dims, file_data)
+
+                        # Instant on a cache hit, even across app restarts
+                        evaluation_data = evaluate(
+                            file_hash, evaluation_mode, custom_criteria,
+                            api_key, file_data
+                        )
+
+                        page_dims = dims_future.result()
+
+                    # Generate marked PDF
+                    marked_pdf = create_marked_pdf(file_data, evaluation_data, evaluation_mode,
+                                                   page_dims=page_dims)
+
+                    st.session_state['marked_pdf'] = marked_pdf
+                    st.session_state['filename'] = uploaded_file.name
+
+                    st.success("✓ PDF generated!")
+
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+
+    elif uploaded_files and api_key:
+        # Batch mode: the Message Batches API grades the whole set
+        # server-side in parallel at a 50% token discount
+        st.info(f"📦 {len(uploaded_files)} files selected — batch mode (50% token discount)")
+
+        if st.button(f"🚀 Evaluate {len(uploaded_files)} Files (Batch)", type="primary", use_container_width=True):
+            try:
+                client = get_client(api_key)
+
+                # custom_id → (filename, bytes), kept in session state so
+                # the poll below can pair results after any rerun
+                batch_files = {}
+                batch_requests = []
+                for i, f in enumerate(uploaded_files):
+                    file_data = f.getvalue()
+                    file_hash = get_file_hash(file_data, evaluation_mode, custom_criteria)
+                    custom_id = f"sheet-{i}-{file_hash[:16]}"
+                    batch_files[custom_id] = (f.name, file_data)
+                    batch_requests.append({
+                        "custom_id": custom_id,
+                        "params": {
+                            "model": "claude-sonnet-4-20250514",
+                            "max_tokens": 8000,
+                            "temperature": 0,
+                            "system": build_system_blocks(evaluation_mode),
+                            "messages": [
                                 {
                                     "role": "user",
-                                    "content": [
-                                        {
-                                            "type": "document",
-                                            "source": {
-                                                "type": "base64",
-                                                "media_type": "application/pdf",
-                                                "data": pdf_data
-                                            }
-                                        },
-                                        {
-                                            "type": "text",
-                                            "text": prompt
-                                        }
-                                    ]
+                                    "content": build_message_content(
+                                        encode_pdf_base64(compress_pdf_for_api(file_data)),
+                                        custom_criteria
+                                    )
                                 }
                             ]
+                        }
+                    })
+
+                batch = client.messages.batches.create(requests=batch_requests)
+                st.session_state['batch_files'] = batch_files
+                st.session_state['batch_id'] = batch.id
+
+            except Exception as e:
+                st.error(f"Error submitting batch: {str(e)}")
+
+        # Poll outside the submit handler: a rerun mid-poll (any widget
+        # interaction interrupts the sleep loop) re-enters here and
+        # resumes the same batch instead of orphaning it
+        if 'batch_id' in st.session_state:
+            try:
+                client = get_client(api_key)
+                batch_id = st.session_state['batch_id']
+                batch_files = st.session_state.get('batch_files', {})
+
+                with st.status(f"Processing batch of {len(batch_files)} files...", expanded=True) as status:
+                    while True:
+                        batch = client.messages.batches.retrieve(batch_id)
+                        if batch.processing_status == "ended":
+                            break
+                        counts = batch.request_counts
+                        st.write(f"⏳ {counts.succeeded} done, {counts.processing} processing...")
+                        time.sleep(_BATCH_POLL_INTERVAL)
+                    status.update(label="Batch complete!", state="complete")
+
+                marked = []
+                for result in client.messages.batches.results(batch_id):
+                    name, data = batch_files.get(result.custom_id, (result.custom_id, None))
+                    if result.result.type == "succeeded" and data is not None:
+                        evaluation_data = parse_json_response(
+                            result.result.message.content[0].text
                         )
-                        
-                        response_text = message.content[0].text
-                        
-                        # Parse evaluation data
-                        evaluation_data = parse_json_response(response_text)
-                        
                         if evaluation_data:
-                            # Generate marked PDF
-                            marked_pdf = create_marked_pdf(file_data, evaluation_data, evaluation_mode)
-                            
-                            st.session_state['marked_pdf'] = marked_pdf
-                            st.session_state['filename'] = uploaded_file.name
-                            
-                            # Cache the result
-                            st.session_state['evaluation_cache'][file_hash] = {
-                                'marked_pdf': marked_pdf,
-                                'filename': uploaded_file.name
-                            }
-                            
-                            st.success("✓ PDF generated!")
-                        else:
-                            st.error("Failed to parse evaluation. Please try again.")
-                            st.text("Raw response:")
-                            st.code(response_text[:500])
-                            
-                    except Exception as e:
-                        st.error(f"Error: {str(e)}")
-    
-    elif not uploaded_file:
+                            marked.append((name, create_marked_pdf(data, evaluation_data, evaluation_mode)))
+                            continue
+                    st.error(f"❌ {name}: evaluation failed")
+
+                st.session_state['batch_marked'] = marked
+                del st.session_state['batch_id']
+                st.success(f"✓ {len(marked)} PDF(s) generated!")
+
+            except Exception as e:
+                st.error(f"Error processing batch: {str(e)}")
+
+    elif not uploaded_files:
         st.info("👆 Upload a PDF to begin")
     elif not api_key:
         st.warning("⚠️ Enter API key in sidebar")
@@ -542,6 +941,21 @@ if 'marked_pdf' in st.session_state:
     
     st.caption("PDF includes marks on each answer + summary page at the end")
 
+# Batch downloads
+if st.session_state.get('batch_marked'):
+    st.markdown("---")
+    st.subheader("📦 Batch Results")
+    for name, pdf_bytes in st.session_state['batch_marked']:
+        base_name = name.replace('.pdf', '')
+        st.download_button(
+            label=f"📥 {base_name}_evaluated.pdf",
+            data=pdf_bytes,
+            file_name=f"{base_name}_evaluated.pdf",
+            mime="application/pdf",
+            key=f"batch-dl-{base_name}",
+            use_container_width=True
+        )
+
 # Footer
 st.markdown("---")
 st.caption("Made with ❤️ using Claude API | Same file = Same results")
@@ -11,18 +11,26 @@ Features:
 """
 
 import streamlit as st
-import anthropic
+import asyncio
 import base64
 import hashlib
 import json
 import re
+from collections import defaultdict
+from functools import lru_cache
 from io import BytesIO
-from pypdf import PdfReader, PdfWriter
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None  # hashlib.sha256 is used when the wheel isn't available
+try:
+    import orjson
+except ImportError:
+    orjson = None  # stdlib json is used when the wheel isn't available
+# anthropic, pypdf and reportlab are imported lazily at their call
+# sites: together they add several hundred ms to cold start, and none
+# are needed until a sheet is actually evaluated
 
 # Page configuration
 st.set_page_config(
@@ -31,17 +39,38 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize cache for consistent evaluations
-if 'evaluation_cache' not in st.session_state:
-    st.session_state['evaluation_cache'] = {}
-
 def get_file_hash(file_data: bytes, evaluation_mode: str, custom_criteria: str) -> str:
     """Generate a unique hash for the file + settings combination."""
-    content = file_data + evaluation_mode.encode() + custom_criteria.encode()
-    return hashlib.sha256(content).hexdigest()
+    if blake3 is not None:
+        # BLAKE3's SIMD tree hash is ~5-10x faster per byte than
+        # SHA-256 on multi-MB sheets
+        h = blake3.blake3()
+    else:
+        h = hashlib.sha256()
+    # Incremental updates: concatenating the settings suffix onto
+    # file_data would copy the entire multi-MB PDF just to feed the
+    # hasher
+    h.update(file_data)
+    h.update(evaluation_mode.encode())
+    h.update(custom_criteria.encode())
+    return h.hexdigest()
+
+def _json_loads(s):
+    """json.loads, through orjson's SIMD structural parser when
+    available — 2-4x faster on the 16K-token responses this app gets."""
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
 
+@lru_cache(maxsize=4)
 def get_evaluation_prompt(mode: str) -> str:
-    """Get the evaluation prompt based on the selected mode."""
+    """Get the evaluation prompt based on the selected mode.
+
+    Pure in `mode` (three values), so the ~3 KB template is formatted
+    once per process instead of on every click; the custom-criteria
+    concatenation stays at the call site.
+    """
     
     mode_instructions = {
         "standard": "Award marks fairly with partial credit. Focus on core concepts.",
@@ -127,50 +156,76 @@ CRITICAL RULES:
     return prompt
 
 
-def create_marks_overlay(evaluation_data: dict, page_width: float, page_height: float, page_num: int) -> BytesIO:
-    """Create a transparent overlay PDF with marks for a specific page."""
+@lru_cache(maxsize=1)
+def _palette() -> dict:
+    """Fixed Color objects shared by every render, built once.
+
+    The overlay and summary layouts never change shape, so their colors
+    are constants; constructing Color objects inside each render was
+    pure allocation churn.
+    """
+    from reportlab.lib import colors
+    return {
+        'header': colors.Color(0.1, 0.2, 0.5),
+        'accent': colors.Color(0.7, 0.1, 0.1),
+        'green': colors.Color(0.1, 0.5, 0.1),
+        'teal': colors.Color(0, 0.4, 0.6),
+        'score_bg': colors.Color(0.95, 0.95, 1),
+        'mark_bg': colors.Color(1, 0.85, 0.85, alpha=0.95),
+    }
+
+
+def create_marks_overlay(questions_on_page: list, page_width: float, page_height: float) -> BytesIO:
+    """Create a transparent overlay PDF with marks for one page.
+
+    Takes the page's (already grouped) questions — create_marked_pdf
+    buckets them by page once, so the full question list is scanned a
+    single time per evaluation instead of once per page.
+    """
+    if not questions_on_page:
+        return None
+
+    from reportlab.pdfgen import canvas
+
     packet = BytesIO()
     c = canvas.Canvas(packet, pagesize=(page_width, page_height))
-    
-    # Get questions for this page
-    questions_on_page = [q for q in evaluation_data.get('questions', []) 
-                        if q.get('page_number', 0) == page_num and q.get('attempted', True)]
-    
-    if questions_on_page:
-        # Position marks in the right margin
-        margin_x = page_width - 85
-        y_position = page_height - 100
-        
-        for q in questions_on_page:
-            if y_position < 80:
-                # Reset position if too low
-                y_position = page_height - 100
-                margin_x -= 95
-            
-            # Draw mark box
-            box_width = 75
-            box_height = 50
-            
-            # Background box - light red/pink
-            c.setFillColor(colors.Color(1, 0.85, 0.85, alpha=0.95))
-            c.setStrokeColor(colors.Color(0.8, 0, 0))
-            c.setLineWidth(2)
-            c.roundRect(margin_x - 5, y_position - 35, box_width, box_height, 5, fill=1, stroke=1)
-            
-            # Question number and Part
-            c.setFillColor(colors.Color(0.8, 0, 0))
-            c.setFont("Helvetica-Bold", 9)
-            part = q.get('part', '')
-            q_num = q.get('question_number', '?')
-            c.drawString(margin_x, y_position + 5, f"Q{q_num}")
-            
-            # Marks - larger font
-            c.setFont("Helvetica-Bold", 16)
-            marks_text = f"{q.get('marks_awarded', '?')}/{q.get('max_marks', '?')}"
-            c.drawString(margin_x, y_position - 20, marks_text)
-            
-            y_position -= 70
-    
+
+    # Lay out each question's slot in the right margin first so draws
+    # can be grouped by canvas state below
+    margin_x = page_width - 85
+    y_position = page_height - 100
+    slots = []
+
+    for q in questions_on_page:
+        if y_position < 80:
+            # Reset position if too low
+            y_position = page_height - 100
+            margin_x -= 95
+
+        slots.append((q, margin_x, y_position))
+        y_position -= 70
+
+    # Invariant state once, not per question: stroke color, line
+    # width, and the translucent box fill (Color object built once)
+    c.setStrokeColorRGB(0.8, 0, 0)
+    c.setLineWidth(2)
+
+    # All mark boxes - light red/pink background
+    c.setFillColor(_palette()['mark_bg'])
+    for q, x, y in slots:
+        c.roundRect(x - 5, y - 35, 75, 50, 5, fill=1, stroke=1)
+
+    # All question numbers, then all marks: one font switch each
+    # instead of two per question
+    c.setFillColorRGB(0.8, 0, 0)
+    c.setFont("Helvetica-Bold", 9)
+    for q, x, y in slots:
+        c.drawString(x, y + 5, f"Q{q.get('question_number', '?')}")
+
+    c.setFont("Helvetica-Bold", 16)
+    for q, x, y in slots:
+        c.drawString(x, y - 20, f"{q.get('marks_awarded', '?')}/{q.get('max_marks', '?')}")
+
     c.save()
     packet.seek(0)
     return packet
@@ -178,14 +233,20 @@ def create_marks_overlay(evaluation_data: dict, page_width: float, page_height:
 
 def create_summary_page(evaluation_data: dict, mode: str) -> BytesIO:
     """Create a comprehensive summary page PDF."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfgen import canvas
+
     packet = BytesIO()
     c = canvas.Canvas(packet, pagesize=A4)
     width, height = A4
     
     # Colors
-    header_color = colors.Color(0.1, 0.2, 0.5)
-    accent_color = colors.Color(0.7, 0.1, 0.1)
-    green_color = colors.Color(0.1, 0.5, 0.1)
+    palette = _palette()
+    header_color = palette['header']
+    accent_color = palette['accent']
+    green_color = palette['green']
     
     y = height - 40
     
@@ -209,7 +270,7 @@ def create_summary_page(evaluation_data: dict, mode: str) -> BytesIO:
     y -= 25
     
     # Total Score Box
-    c.setFillColor(colors.Color(0.95, 0.95, 1))
+    c.setFillColor(palette['score_bg'])
     c.setStrokeColor(header_color)
     c.setLineWidth(2)
     c.roundRect(50, y - 55, width - 100, 60, 8, fill=1, stroke=1)
@@ -370,11 +431,11 @@ def create_summary_page(evaluation_data: dict, mode: str) -> BytesIO:
     
     # Improvement Suggestions
     if y > 100:
-        c.setFillColor(colors.Color(0, 0.4, 0.6))
+        c.setFillColor(palette['teal'])
         c.setFont("Helvetica-Bold", 11)
         c.drawString(50, y, "SUGGESTIONS FOR IMPROVEMENT")
         y -= 5
-        c.setStrokeColor(colors.Color(0, 0.4, 0.6))
+        c.setStrokeColor(palette['teal'])
         c.line(50, y, 250, y)
         y -= 14
         
@@ -396,18 +457,24 @@ def create_summary_page(evaluation_data: dict, mode: str) -> BytesIO:
         c.setFont("Helvetica-Oblique", 9)
         feedback = evaluation_data.get('overall_feedback', '')[:200]
         
-        # Simple word wrap
-        words = feedback.split()
-        line = ""
-        for word in words:
-            if len(line + word) < 90:
-                line += word + " "
-            else:
-                c.drawString(55, y, line.strip())
+        # Wrap on measured glyph widths (stringWidth is C-accelerated
+        # with cached metrics) instead of character counts, accumulating
+        # word widths rather than rebuilding the line string per word
+        budget = width - 110
+        space_w = pdfmetrics.stringWidth(" ", "Helvetica-Oblique", 9)
+        line_words = []
+        line_w = 0.0
+        for word in feedback.split():
+            word_w = pdfmetrics.stringWidth(word, "Helvetica-Oblique", 9)
+            if line_words and line_w + word_w > budget:
+                c.drawString(55, y, " ".join(line_words))
                 y -= 11
-                line = word + " "
-        if line:
-            c.drawString(55, y, line.strip())
+                line_words = []
+                line_w = 0.0
+            line_words.append(word)
+            line_w += word_w + space_w
+        if line_words:
+            c.drawString(55, y, " ".join(line_words))
     
     # Footer
     c.setFillColor(colors.gray)
@@ -421,76 +488,318 @@ def create_summary_page(evaluation_data: dict, mode: str) -> BytesIO:
 
 def create_marked_pdf(original_pdf_bytes: bytes, evaluation_data: dict, mode: str) -> bytes:
     """Create the final PDF with marks overlay and summary page."""
-    
-    # Read original PDF
-    original_reader = PdfReader(BytesIO(original_pdf_bytes))
-    writer = PdfWriter()
-    
-    # Process each page
-    for page_num, page in enumerate(original_reader.pages, 1):
-        page_width = float(page.mediabox.width)
-        page_height = float(page.mediabox.height)
-        
-        # Create overlay for this page
-        overlay_packet = create_marks_overlay(evaluation_data, page_width, page_height, page_num)
-        overlay_reader = PdfReader(overlay_packet)
-        
-        if len(overlay_reader.pages) > 0:
-            overlay_page = overlay_reader.pages[0]
-            page.merge_page(overlay_page)
-        
-        writer.add_page(page)
-    
+    from pypdf import PdfReader, PdfWriter
+
+    # Clone the original wholesale: pypdf copies untouched pages (and
+    # their stream compression) through instead of re-serializing each
+    # one added via add_page
+    writer = PdfWriter(clone_from=BytesIO(original_pdf_bytes))
+
+    # Group attempted questions by page once, so blank pages (question
+    # paper pages, unused backs) are known up front
+    pages_map = defaultdict(list)
+    for q in evaluation_data.get('questions', []):
+        if q.get('attempted', True):
+            pages_map[q.get('page_number', 0)].append(q)
+
+    # Merge overlays in place; pages with no marks are never touched.
+    # Scanned answer sheets are nearly always a uniform page size, so
+    # resolve the mediabox to floats once per distinct box rather than
+    # re-walking pypdf's number wrappers for every marked page
+    dims_by_box = {}
+    for page_num, page in enumerate(writer.pages, 1):
+        questions_on_page = pages_map.get(page_num)
+        if questions_on_page:
+            box = tuple(page.mediabox)
+            dims = dims_by_box.get(box)
+            if dims is None:
+                dims = dims_by_box[box] = (
+                    float(page.mediabox.width), float(page.mediabox.height)
+                )
+            page_width, page_height = dims
+
+            # Create overlay for this page; with questions present the
+            # canvas always yields exactly one page
+            overlay_packet = create_marks_overlay(questions_on_page, page_width, page_height)
+            overlay_reader = PdfReader(overlay_packet)
+            page.merge_page(overlay_reader.pages[0])
+
     # Add summary page at the end
     summary_packet = create_summary_page(evaluation_data, mode)
-    summary_reader = PdfReader(summary_packet)
-    for summary_page in summary_reader.pages:
-        writer.add_page(summary_page)
-    
+    writer.append(summary_packet)
+
     # Write final PDF
     output_buffer = BytesIO()
     writer.write(output_buffer)
     output_buffer.seek(0)
-    
+
     return output_buffer.getvalue()
 
 
+# Compiled once at import instead of re-cache lookups per response:
+# markdown fences at either end, and trailing commas before } or ]
+# (handled in a single pass via the captured closer)
+_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+
 def parse_json_response(response_text: str) -> dict:
     """Parse JSON from Claude's response, handling potential issues."""
-    text = response_text.strip()
-    
     # Remove markdown code blocks if present
-    if text.startswith("```json"):
-        text = text[7:]
-    if text.startswith("```"):
-        text = text[3:]
-    if text.endswith("```"):
-        text = text[:-3]
-    
-    text = text.strip()
-    
+    text = _FENCE.sub('', response_text.strip())
+
     # Find JSON object
     start = text.find('{')
     end = text.rfind('}') + 1
-    
+
     if start != -1 and end > start:
         json_str = text[start:end]
+        # Strip trailing commas up front: orjson rejects them strictly,
+        # and doing it once here is cheaper than a failed parse + retry
+        json_str = _TRAILING_COMMA.sub(r'\1', json_str)
         try:
-            return json.loads(json_str)
+            return _json_loads(json_str)
         except json.JSONDecodeError as e:
             st.error(f"JSON parsing error: {e}")
             # Try to fix common issues
             json_str = json_str.replace("'", '"')
-            json_str = re.sub(r',\s*}', '}', json_str)  # Remove trailing commas
-            json_str = re.sub(r',\s*]', ']', json_str)
             try:
-                return json.loads(json_str)
+                return _json_loads(json_str)
             except:
                 pass
-    
+
+    return None
+
+
+class _QuestionScanner:
+    """Incrementally extract completed question objects from the stream.
+
+    A string- and escape-aware brace-depth tracker that survives chunk
+    boundaries: each depth-2 object is captured as its characters
+    arrive and parsed the moment its closing brace lands, so the UI can
+    show real per-question results a minute before the full response
+    finishes. Objects without a question_number (part summaries) are
+    dropped. A hand-rolled state machine is plenty here — the LLM
+    streams far slower than even stdlib json parses.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._obj_chars = None
+
+    def feed(self, chunk: str) -> list:
+        """Consume a text delta; return question dicts completed by it."""
+        completed = []
+        for ch in chunk:
+            if self._obj_chars is not None:
+                self._obj_chars.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                self._depth += 1
+                if self._depth == 2:
+                    self._obj_chars = ['{']
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 1 and self._obj_chars is not None:
+                    try:
+                        obj = _json_loads("".join(self._obj_chars))
+                    except Exception:
+                        obj = None
+                    self._obj_chars = None
+                    if isinstance(obj, dict) and 'question_number' in obj:
+                        completed.append(obj)
+        return completed
+
+
+def validate_total_marks(evaluation_data: dict):
+    """Cross-check the LLM's reported total against the question sum.
+
+    Claude occasionally gets its own arithmetic wrong; a single pass
+    over the questions catches that. Returns (reported, computed) when
+    they differ by more than half a mark, else None. Range-mode marks
+    ('6-8') are skipped — their totals are ranges too.
+    """
+    total = 0.0
+    counted = 0
+    for q in evaluation_data.get('questions', []):
+        marks = str(q.get('marks_awarded', ''))
+        if '-' in marks:
+            return None
+        try:
+            total += float(marks)
+            counted += 1
+        except ValueError:
+            continue
+
+    try:
+        reported = float(str(evaluation_data.get('total_marks_awarded', '')))
+    except ValueError:
+        return None
+
+    if counted and abs(reported - total) > 0.5:
+        return reported, total
     return None
 
 
+@st.cache_data(ttl=86400, max_entries=32, show_spinner=False)
+def _evaluate(file_hash: str, mode: str, criteria: str,
+              _api_key: str, _file_data: bytes) -> dict:
+    """Run the Claude evaluation and return the parsed JSON result.
+
+    Keyed on the file hash + settings — the underscore args are left
+    out of the cache key, so Streamlit never hashes the multi-MB PDF —
+    and shared across sessions, so a second tab (or a rerun) evaluating
+    the same sheet is a lookup instead of a 60-90s API call.
+    """
+    import anthropic
+
+    client = anthropic.Anthropic(api_key=_api_key)
+
+    # Encode through a memoryview (no defensive copy of the PDF) and
+    # decode as ASCII: base64 output is pure ASCII, so this takes
+    # CPython's fast path instead of the general UTF-8 decoder
+    pdf_data = base64.b64encode(memoryview(_file_data)).decode('ascii')
+
+    prompt = get_evaluation_prompt(mode)
+    if criteria:
+        prompt += f"\n\nMARKING SCHEME PROVIDED:\n{criteria}"
+
+    # Stream the response so the user sees per-question progress during
+    # the 60-90s generation instead of a silent block
+    status_box = st.empty()
+    buf = []
+    scanner = _QuestionScanner()
+    questions_seen = 0
+
+    with client.messages.stream(
+        model="claude-sonnet-4-20250514",
+        max_tokens=16000,  # Increased for more questions
+        temperature=0,
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "document",
+                        "source": {
+                            "type": "base64",
+                            "media_type": "application/pdf",
+                            "data": pdf_data
+                        }
+                    },
+                    {
+                        "type": "text",
+                        "text": prompt
+                    }
+                ]
+            }
+        ]
+    ) as stream:
+        for text in stream.text_stream:
+            buf.append(text)
+            # Scan just the new chunk; the scanner carries state across
+            # boundaries and yields each question as it completes
+            for q in scanner.feed(text):
+                questions_seen += 1
+                status_box.info(
+                    f"⏳ Evaluating... Q{q.get('question_number', '?')}: "
+                    f"{q.get('marks_awarded', '?')}/{q.get('max_marks', '?')} "
+                    f"({questions_seen} done so far)"
+                )
+
+    status_box.empty()
+    response_text = "".join(buf)
+    evaluation_data = parse_json_response(response_text)
+
+    if evaluation_data is None:
+        # Raise so the failure is never cached; a retry re-calls the API
+        raise ValueError(f"Failed to parse evaluation. Raw response:\n{response_text[:2000]}")
+
+    return evaluation_data
+
+
+# Concurrent sheets in batch mode; raise if your Anthropic rate limit
+# (requests/min) allows more
+_BATCH_CONCURRENCY = 4
+
+
+async def _evaluate_many(files: list, mode: str, criteria: str,
+                         api_key: str, progress_cb) -> list:
+    """Evaluate several sheets concurrently with the async client.
+
+    Each sheet is an independent 60-90s API call, so fanning them out
+    with asyncio.gather overlaps the network/LLM latency across sheets;
+    the semaphore keeps concurrent requests under the account rate
+    limit. Results come back in input order; a sheet whose response
+    fails to parse yields None instead of failing the whole batch.
+
+    progress_cb(done_count) runs on the script thread (asyncio.run is
+    called from the Streamlit handler), so it can touch st widgets.
+    """
+    import anthropic
+
+    aclient = anthropic.AsyncAnthropic(api_key=api_key)
+    sem = asyncio.Semaphore(_BATCH_CONCURRENCY)
+    done = 0
+
+    prompt = get_evaluation_prompt(mode)
+    if criteria:
+        prompt += f"\n\nMARKING SCHEME PROVIDED:\n{criteria}"
+
+    async def grade_one(file_data: bytes):
+        nonlocal done
+        pdf_data = base64.b64encode(memoryview(file_data)).decode('ascii')
+        async with sem:
+            msg = await aclient.messages.create(
+                model="claude-sonnet-4-20250514",
+                max_tokens=16000,
+                temperature=0,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "document",
+                                "source": {
+                                    "type": "base64",
+                                    "media_type": "application/pdf",
+                                    "data": pdf_data
+                                }
+                            },
+                            {
+                                "type": "text",
+                                "text": prompt
+                            }
+                        ]
+                    }
+                ]
+            )
+        done += 1
+        progress_cb(done)
+        return parse_json_response(msg.content[0].text)
+
+    return await asyncio.gather(*(grade_one(f) for f in files))
+
+
+@st.cache_data(ttl=86400, max_entries=32, show_spinner=False)
+def _marked_pdf_bytes(file_hash: str, mode: str,
+                      _file_data: bytes, _evaluation_data: dict) -> bytes:
+    """create_marked_pdf, cached on the same key as the evaluation so
+    page reloads skip the overlay/summary rebuild too."""
+    return create_marked_pdf(_file_data, _evaluation_data, mode)
+
+
 # Title and description
 st.title("📝 Handwritten Answer Sheet Evaluator")
 st.markdown("##### Upload answer sheet → Get marked PDF with complete evaluation")
@@ -528,9 +837,12 @@ with st.sidebar:
     st.markdown("---")
     
     if st.button("🗑️ Clear Cache"):
-        st.session_state['evaluation_cache'] = {}
+        _evaluate.clear()
+        _marked_pdf_bytes.clear()
         if 'marked_pdf' in st.session_state:
             del st.session_state['marked_pdf']
+        if 'batch_results' in st.session_state:
+            del st.session_state['batch_results']
         st.success("Cleared!")
         st.rerun()
 
@@ -540,18 +852,25 @@ col1, col2 = st.columns([1, 1])
 with col1:
     st.header("📤 Upload Answer Sheet")
     
-    uploaded_file = st.file_uploader(
-        "Choose PDF file",
+    uploaded_files = st.file_uploader(
+        "Choose PDF file(s)",
         type=['pdf'],
-        help="Upload complete answer sheet"
+        accept_multiple_files=True,
+        help="Upload one answer sheet, or several to grade in parallel"
     )
-    
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
+
     custom_criteria = ""
-    
+
     if uploaded_file:
         st.success(f"✓ {uploaded_file.name}")
         st.info(f"Size: {len(uploaded_file.getvalue()):,} bytes")
-        
+    elif uploaded_files:
+        st.success(f"✓ {len(uploaded_files)} sheets ready")
+        for f in uploaded_files:
+            st.caption(f"• {f.name} ({len(f.getvalue()):,} bytes)")
+
+    if uploaded_files:
         with st.expander("🎯 Custom Marking Scheme (Optional)"):
             custom_criteria = st.text_area(
                 "Enter marking scheme:",
@@ -566,87 +885,74 @@ with col2:
         file_data = uploaded_file.getvalue()
         file_hash = get_file_hash(file_data, evaluation_mode, custom_criteria)
         
-        is_cached = file_hash in st.session_state['evaluation_cache']
-        
-        if is_cached:
-            st.info("💾 Cached result available")
-        
-        button_text = "📋 Load Cached" if is_cached else "🚀 Evaluate All Questions"
-        
-        if st.button(button_text, type="primary", use_container_width=True):
-            
-            if is_cached:
-                cached = st.session_state['evaluation_cache'][file_hash]
-                st.session_state['marked_pdf'] = cached['marked_pdf']
-                st.session_state['filename'] = cached['filename']
-                st.session_state['eval_data'] = cached.get('eval_data', {})
-                st.success("✓ Loaded!")
-            else:
-                with st.spinner("Analyzing ALL questions... (60-90 seconds)"):
-                    try:
-                        client = anthropic.Anthropic(api_key=api_key)
-                        
-                        pdf_data = base64.standard_b64encode(file_data).decode('utf-8')
-                        
-                        prompt = get_evaluation_prompt(evaluation_mode)
-                        if custom_criteria:
-                            prompt += f"\n\nMARKING SCHEME PROVIDED:\n{custom_criteria}"
-                        
-                        message = client.messages.create(
-                            model="claude-sonnet-4-20250514",
-                            max_tokens=16000,  # Increased for more questions
-                            temperature=0,
-                            messages=[
-                                {
-                                    "role": "user",
-                                    "content": [
-                                        {
-                                            "type": "document",
-                                            "source": {
-                                                "type": "base64",
-                                                "media_type": "application/pdf",
-                                                "data": pdf_data
-                                            }
-                                        },
-                                        {
-                                            "type": "text",
-                                            "text": prompt
-                                        }
-                                    ]
-                                }
-                            ]
+        if st.button("🚀 Evaluate All Questions", type="primary", use_container_width=True):
+            with st.spinner("Analyzing ALL questions... (60-90 seconds)"):
+                try:
+                    # Instant on a cache hit, shared across sessions
+                    evaluation_data = _evaluate(
+                        file_hash, evaluation_mode, custom_criteria,
+                        api_key, file_data
+                    )
+
+                    # Validate we got all questions
+                    num_questions = len(evaluation_data.get('questions', []))
+                    st.info(f"Evaluated {num_questions} questions")
+
+                    # Flag LLM arithmetic errors in the reported total
+                    mismatch = validate_total_marks(evaluation_data)
+                    if mismatch:
+                        st.warning(
+                            f"⚠️ Reported total ({mismatch[0]:g}) doesn't match "
+                            f"the per-question sum ({mismatch[1]:g}) — verify "
+                            f"marks in the PDF"
                         )
-                        
-                        response_text = message.content[0].text
-                        evaluation_data = parse_json_response(response_text)
-                        
-                        if evaluation_data:
-                            # Validate we got all questions
-                            num_questions = len(evaluation_data.get('questions', []))
-                            st.info(f"Evaluated {num_questions} questions")
-                            
-                            marked_pdf = create_marked_pdf(file_data, evaluation_data, evaluation_mode)
-                            
-                            st.session_state['marked_pdf'] = marked_pdf
-                            st.session_state['filename'] = uploaded_file.name
-                            st.session_state['eval_data'] = evaluation_data
-                            
-                            st.session_state['evaluation_cache'][file_hash] = {
-                                'marked_pdf': marked_pdf,
-                                'filename': uploaded_file.name,
-                                'eval_data': evaluation_data
-                            }
-                            
-                            st.success(f"✓ PDF generated with {num_questions} questions evaluated!")
-                        else:
-                            st.error("Failed to parse evaluation")
-                            with st.expander("Debug: Raw Response"):
-                                st.code(response_text[:2000])
-                            
-                    except Exception as e:
-                        st.error(f"Error: {str(e)}")
-    
-    elif not uploaded_file:
+
+                    marked_pdf = _marked_pdf_bytes(
+                        file_hash, evaluation_mode, file_data, evaluation_data
+                    )
+
+                    st.session_state['marked_pdf'] = marked_pdf
+                    st.session_state['filename'] = uploaded_file.name
+                    st.session_state['eval_data'] = evaluation_data
+
+                    st.success(f"✓ PDF generated with {num_questions} questions evaluated!")
+
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+
+    elif uploaded_files and api_key:
+        n = len(uploaded_files)
+        if st.button(f"🚀 Evaluate {n} Sheets in Parallel", type="primary", use_container_width=True):
+            all_bytes = [f.getvalue() for f in uploaded_files]
+            progress = st.progress(0, text=f"Evaluating 0/{n} sheets...")
+
+            try:
+                results = asyncio.run(_evaluate_many(
+                    all_bytes, evaluation_mode, custom_criteria, api_key,
+                    lambda done: progress.progress(
+                        done / n, text=f"Evaluating {done}/{n} sheets..."
+                    )
+                ))
+                progress.empty()
+
+                batch_results = []
+                for f, file_data, evaluation_data in zip(uploaded_files, all_bytes, results):
+                    if evaluation_data is None:
+                        st.error(f"✗ {f.name}: failed to parse evaluation")
+                        continue
+                    file_hash = get_file_hash(file_data, evaluation_mode, custom_criteria)
+                    marked_pdf = _marked_pdf_bytes(
+                        file_hash, evaluation_mode, file_data, evaluation_data
+                    )
+                    batch_results.append((f.name, marked_pdf, evaluation_data))
+
+                st.session_state['batch_results'] = batch_results
+                st.success(f"✓ {len(batch_results)}/{n} sheets evaluated!")
+
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+
+    elif not uploaded_files:
         st.info("👆 Upload a PDF")
     elif not api_key:
         st.warning("⚠️ Enter API key")
@@ -680,6 +986,23 @@ if 'marked_pdf' in st.session_state:
     
     st.caption("✓ Marks on each answer + Complete summary page at end")
 
+# Batch download section
+if st.session_state.get('batch_results'):
+    st.markdown("---")
+    st.subheader("📥 Marked Sheets")
+
+    for name, marked_pdf, eval_data in st.session_state['batch_results']:
+        score = f"{eval_data.get('total_marks_awarded', '?')}/{eval_data.get('total_max_marks', '?')}"
+        pct = eval_data.get('percentage', '?')
+        st.download_button(
+            label=f"📥 {name} — {score} ({pct}%)",
+            data=marked_pdf,
+            file_name=f"{name.replace('.pdf', '')}_evaluated.pdf",
+            mime="application/pdf",
+            use_container_width=True,
+            key=f"batch-dl-{name}"
+        )
+
 # Footer
 st.markdown("---")
 st.caption("Made with ❤️ using Claude AI | Evaluates ALL questions consistently")